@@ -0,0 +1,40 @@
+"""
+Горячие циклы импорта данных, вынесенные из bd.py для компиляции mypyc.
+
+Модуль работает и как обычный Python-код: если скомпилированная версия
+не собрана (python setup.py build_ext --inplace), импортируется этот файл.
+"""
+import json
+from typing import Any, Dict, List, Tuple
+
+# Кэш текстов INSERT по (таблица, колонки)
+_insert_sql_cache: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+
+def insert_sql(table_name: str, columns: Tuple[str, ...]) -> str:
+    """Текст INSERT для набора колонок (строится один раз на набор)"""
+    key = (table_name, columns)
+    query = _insert_sql_cache.get(key)
+    if query is None:
+        placeholders = ', '.join(['?' for _ in columns])
+        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        _insert_sql_cache[key] = query
+    return query
+
+
+def flatten_json_item(item: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[Any, ...]]:
+    """Колонки и значения элемента JSON; вложенные структуры сериализуются в строку"""
+    columns: List[str] = []
+    values: List[Any] = []
+    for key, value in item.items():
+        columns.append(key)
+        if isinstance(value, (dict, list)):
+            values.append(json.dumps(value, ensure_ascii=False))
+        else:
+            values.append(value)
+    return tuple(columns), tuple(values)
+
+
+def csv_row_to_tuple(row: Dict[str, Any], fields: List[str]) -> Tuple[Any, ...]:
+    """Значения строки CSV в порядке колонок вставки"""
+    return tuple([row[field] for field in fields])
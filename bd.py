@@ -1,9 +1,75 @@
 import sqlite3
 import csv
+import itertools
 import json
 import logging
+import queue
+import re
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import apsw  # Драйвер SQLite с меньшими накладными расходами на выборку строк
+except ImportError:
+    apsw = None
+
+try:
+    import orjson  # Быстрый JSON на C; без него используется стандартный модуль json
+except ImportError:
+    orjson = None
+
+# Горячие циклы импорта (компилируются mypyc, иначе работают как обычный Python)
+from _fastpath import csv_row_to_tuple, flatten_json_item, insert_sql
+
+# UPSERT ... RETURNING поддерживается начиная с SQLite 3.35
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Ошибки, которые могут прийти от любого из драйверов
+DB_ERRORS = (sqlite3.Error,) + ((apsw.Error,) if apsw is not None else ())
+
+
+def _json_loads(data: bytes) -> Any:
+    """Разбор JSON из байтов (UTF-8)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps_pretty(obj: Any) -> bytes:
+    """Сериализация в JSON с отступом 2 и str() для неизвестных типов (например, datetime)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+
+class _ApswRow:
+    """Строка результата apsw с доступом по индексу и по имени колонки, как у sqlite3.Row"""
+    
+    __slots__ = ('_index', '_values')
+    
+    def __init__(self, index: Dict[str, int], values: tuple):
+        self._index = index
+        self._values = values
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+    
+    def keys(self) -> List[str]:
+        return list(self._index)
+    
+    def __iter__(self):
+        return iter(self._values)
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    def __repr__(self) -> str:
+        return f"_ApswRow({dict(zip(self._index, self._values))!r})"
+
 
 class DatabaseManager:
     """
@@ -11,19 +77,84 @@ class DatabaseManager:
     с поддержкой транзакций, импорта/экспорта и оптимизации
     """
     
-    def __init__(self, db_path: str = "ecommerce.db"):
+    # Размер порции строк (и транзакции) при импорте CSV
+    CSV_IMPORT_CHUNK_SIZE = 10_000
+    # Число строк, начиная с которого индексы пересоздаются после загрузки, а не обновляются построчно
+    BULK_LOAD_THRESHOLD = 10_000
+    
+    # Загружаемое расширение SQLite с виртуальной таблицей csv (None - не использовать)
+    CSV_EXTENSION = 'csv'
+    
+    # Размер порции строк при экспорте
+    EXPORT_CHUNK_SIZE = 10_000
+    
+    # Таблицы, доступные для очистки, импорта, экспорта и статистики
+    ALLOWED_TABLES = ('products', 'categories', 'customers', 'orders', 'order_items')
+    
+    # Фильтры get_products в порядке битов маски запроса
+    PRODUCT_FILTERS = ('category_id', 'min_price', 'max_price', 'search')
+    # Поля продукта, разрешенные для обновления
+    PRODUCT_UPDATE_FIELDS = ('name', 'description', 'price', 'stock_quantity', 'category_id')
+    # Лимит параметров в одном запросе (SQLITE_MAX_VARIABLE_NUMBER старых сборок)
+    MAX_SQL_VARIABLES = 999
+    
+    def __init__(self, db_path: str = "ecommerce.db", pool_size: int = 5,
+                 driver: Optional[str] = None):
         self.db_path = db_path
+        # Драйвер для отчетных запросов на чтение: apsw, если установлен, иначе sqlite3
+        if driver is None:
+            driver = 'apsw' if apsw is not None else 'sqlite3'
+        if driver not in ('apsw', 'sqlite3'):
+            raise ValueError(f"Неизвестный драйвер БД: {driver}")
+        if driver == 'apsw' and apsw is None:
+            raise ValueError("Драйвер apsw не установлен")
+        self._driver = driver
+        # Пул постоянных соединений вместо sqlite3.connect на каждый вызов
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_lock = threading.Lock()
+        self._created_connections = 0
+        # Отдельный пул того же размера для соединений apsw
+        self._apsw_pool = queue.LifoQueue(maxsize=pool_size)
+        self._created_apsw_connections = 0
+        # Сбрасывается, если расширение csv не удалось загрузить
+        self._csv_extension_available = self.CSV_EXTENSION is not None
+        # Готовые тексты запросов: одинаковые строки SQL попадают в кэш подготовленных выражений
+        self._products_queries = self._build_products_queries()
+        self._update_product_queries = self._build_update_product_queries()
+        # Служебные запросы по таблицам из белого списка (имя таблицы проверяется поиском в словаре)
+        self._sql = {
+            table: {
+                'truncate_rows': f"DELETE FROM {table}",
+                'truncate_seq': "DELETE FROM sqlite_sequence WHERE name = ?",
+                'count': f"SELECT COUNT(*) FROM {table}",
+                'select_all': f"SELECT * FROM {table}",
+            }
+            for table in self.ALLOWED_TABLES
+        }
+        # Размер БД и количество записей во всех таблицах одним запросом
+        self._stats_sql = " UNION ALL ".join(
+            ["SELECT 'database_size', page_count * page_size FROM pragma_page_count(), pragma_page_size()"]
+            + [f"SELECT '{table}_count', COUNT(*) FROM {table}" for table in self.ALLOWED_TABLES]
+        )
+        # Порядок параметров совпадает с сигнатурой create_product_fast
+        self._insert_product_sql = (
+            "INSERT INTO products(name,description,price,stock_quantity,category_id) VALUES(?,?,?,?,?)"
+        )
         self.setup_logging()
         self.init_database()
     
     def setup_logging(self):
         """Настройка логирования операций"""
+        # В консоль - только предупреждения и ошибки: вывод на экран дорог в циклах
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.WARNING)
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
             handlers=[
                 logging.FileHandler('database_operations.log'),
-                logging.StreamHandler()
+                console_handler
             ]
         )
         self.logger = logging.getLogger(__name__)
@@ -167,6 +298,7 @@ class DatabaseManager:
                 cursor.executescript("""
                     CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
                     CREATE INDEX IF NOT EXISTS idx_products_price ON products(price);
+                    CREATE INDEX IF NOT EXISTS idx_products_created_id ON products(created_at DESC, product_id DESC);
                     CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email);
                     CREATE INDEX IF NOT EXISTS idx_orders_customer_date ON orders(customer_id, order_date);
                     CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
@@ -174,36 +306,348 @@ class DatabaseManager:
                     CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
                 """)
                 
+                # Полнотекстовый индекс для поиска по названию и описанию продуктов
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+                fts_exists = cursor.fetchone() is not None
+                cursor.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                        name, description,
+                        content='products', content_rowid='product_id',
+                        tokenize='porter unicode61'
+                    );
+                    
+                    CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+                        INSERT INTO products_fts(rowid, name, description)
+                        VALUES (new.product_id, new.name, new.description);
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+                        INSERT INTO products_fts(products_fts, rowid, name, description)
+                        VALUES ('delete', old.product_id, old.name, old.description);
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF name, description ON products BEGIN
+                        INSERT INTO products_fts(products_fts, rowid, name, description)
+                        VALUES ('delete', old.product_id, old.name, old.description);
+                        INSERT INTO products_fts(rowid, name, description)
+                        VALUES (new.product_id, new.name, new.description);
+                    END;
+                """)
+                if not fts_exists:
+                    # Индексация продуктов, созданных до появления FTS-таблицы
+                    cursor.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+                
+                # Сводка продаж по продуктам, поддерживаемая триггерами (без отмененных заказов)
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'product_sales_summary'")
+                summary_exists = cursor.fetchone() is not None
+                cursor.executescript("""
+                    CREATE TABLE IF NOT EXISTS product_sales_summary (
+                        product_id INTEGER PRIMARY KEY,
+                        total_sold INTEGER NOT NULL DEFAULT 0,
+                        total_revenue DECIMAL(10,2) NOT NULL DEFAULT 0
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_summary_sold
+                        ON product_sales_summary(total_sold DESC, total_revenue DESC);
+                    
+                    CREATE TRIGGER IF NOT EXISTS products_summary_ai AFTER INSERT ON products BEGIN
+                        INSERT OR IGNORE INTO product_sales_summary(product_id) VALUES (new.product_id);
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS products_summary_ad AFTER DELETE ON products BEGIN
+                        DELETE FROM product_sales_summary WHERE product_id = old.product_id;
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS order_items_summary_ai AFTER INSERT ON order_items
+                    WHEN (SELECT status FROM orders WHERE order_id = new.order_id) != 'cancelled'
+                    BEGIN
+                        INSERT INTO product_sales_summary(product_id, total_sold, total_revenue)
+                        VALUES (new.product_id, new.quantity, new.quantity * new.unit_price)
+                        ON CONFLICT(product_id) DO UPDATE SET
+                            total_sold = total_sold + excluded.total_sold,
+                            total_revenue = total_revenue + excluded.total_revenue;
+                    END;
+                    
+                    -- При каскадном удалении заказа строки orders уже нет: его позиции вычитает orders_summary_bd
+                    CREATE TRIGGER IF NOT EXISTS order_items_summary_ad AFTER DELETE ON order_items
+                    WHEN (SELECT status FROM orders WHERE order_id = old.order_id) != 'cancelled'
+                    BEGIN
+                        UPDATE product_sales_summary SET
+                            total_sold = total_sold - old.quantity,
+                            total_revenue = total_revenue - old.quantity * old.unit_price
+                        WHERE product_id = old.product_id;
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS order_items_summary_au
+                    AFTER UPDATE OF order_id, product_id, quantity, unit_price ON order_items
+                    BEGIN
+                        UPDATE product_sales_summary SET
+                            total_sold = total_sold - old.quantity,
+                            total_revenue = total_revenue - old.quantity * old.unit_price
+                        WHERE product_id = old.product_id
+                          AND (SELECT status FROM orders WHERE order_id = old.order_id) != 'cancelled';
+                        INSERT INTO product_sales_summary(product_id, total_sold, total_revenue)
+                        SELECT new.product_id, new.quantity, new.quantity * new.unit_price
+                        WHERE (SELECT status FROM orders WHERE order_id = new.order_id) != 'cancelled'
+                        ON CONFLICT(product_id) DO UPDATE SET
+                            total_sold = total_sold + excluded.total_sold,
+                            total_revenue = total_revenue + excluded.total_revenue;
+                    END;
+                    
+                    CREATE TRIGGER IF NOT EXISTS orders_summary_bd BEFORE DELETE ON orders
+                    WHEN old.status != 'cancelled'
+                    BEGIN
+                        UPDATE product_sales_summary SET
+                            total_sold = total_sold - (
+                                SELECT SUM(oi.quantity) FROM order_items oi
+                                WHERE oi.order_id = old.order_id
+                                  AND oi.product_id = product_sales_summary.product_id),
+                            total_revenue = total_revenue - (
+                                SELECT SUM(oi.quantity * oi.unit_price) FROM order_items oi
+                                WHERE oi.order_id = old.order_id
+                                  AND oi.product_id = product_sales_summary.product_id)
+                        WHERE product_id IN (SELECT product_id FROM order_items WHERE order_id = old.order_id);
+                    END;
+                    
+                    -- Отмена заказа (или возврат из отмененных) вычитает или добавляет его позиции
+                    CREATE TRIGGER IF NOT EXISTS orders_summary_au AFTER UPDATE OF status ON orders
+                    WHEN (old.status = 'cancelled') != (new.status = 'cancelled')
+                    BEGIN
+                        UPDATE product_sales_summary SET
+                            total_sold = total_sold
+                                + (CASE WHEN new.status = 'cancelled' THEN -1 ELSE 1 END) * (
+                                    SELECT SUM(oi.quantity) FROM order_items oi
+                                    WHERE oi.order_id = new.order_id
+                                      AND oi.product_id = product_sales_summary.product_id),
+                            total_revenue = total_revenue
+                                + (CASE WHEN new.status = 'cancelled' THEN -1 ELSE 1 END) * (
+                                    SELECT SUM(oi.quantity * oi.unit_price) FROM order_items oi
+                                    WHERE oi.order_id = new.order_id
+                                      AND oi.product_id = product_sales_summary.product_id)
+                        WHERE product_id IN (SELECT product_id FROM order_items WHERE order_id = new.order_id);
+                    END;
+                """)
+                if not summary_exists:
+                    # Заполнение сводки по продажам, сделанным до появления таблицы
+                    cursor.execute("""
+                        INSERT INTO product_sales_summary(product_id, total_sold, total_revenue)
+                        SELECT
+                            p.product_id,
+                            COALESCE(SUM(CASE WHEN o.status != 'cancelled' THEN oi.quantity END), 0),
+                            COALESCE(SUM(CASE WHEN o.status != 'cancelled' THEN oi.quantity * oi.unit_price END), 0)
+                        FROM products p
+                        LEFT JOIN order_items oi ON p.product_id = oi.product_id
+                        LEFT JOIN orders o ON oi.order_id = o.order_id
+                        GROUP BY p.product_id
+                    """)
+                
                 conn.commit()
                 self.logger.info("База данных инициализирована успешно")
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка инициализации БД: {e}")
+            self.logger.error("Ошибка инициализации БД: %s", e)
             raise
     
+    def _create_connection(self) -> sqlite3.Connection:
+        """Открытие нового соединения для пула"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=512)
+        conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+        # Настройки действуют только в рамках соединения, поэтому применяются
+        # один раз при его создании (synchronous=NORMAL безопасен в режиме WAL)
+        conn.executescript("""
+            PRAGMA foreign_keys = ON;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = -65536;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 268435456;
+            PRAGMA wal_autocheckpoint = 1000;
+        """)
+        if self._csv_extension_available:
+            self._csv_extension_available = self._load_csv_extension(conn)
+        return conn
+    
+    def _load_csv_extension(self, conn: sqlite3.Connection) -> bool:
+        """Загрузка расширения csv в соединение; False, если загрузка недоступна"""
+        try:
+            conn.enable_load_extension(True)
+            try:
+                conn.load_extension(self.CSV_EXTENSION)
+            finally:
+                conn.enable_load_extension(False)
+            return True
+        except (AttributeError, sqlite3.Error):
+            # Сборка Python без поддержки расширений или расширение не найдено
+            return False
+    
+    def _acquire_connection(self) -> sqlite3.Connection:
+        """Выдача свободного соединения из пула (или создание нового, пока пул не заполнен)"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if self._created_connections < self.pool_size:
+                conn = self._create_connection()
+                self._created_connections += 1
+                return conn
+        
+        # Все соединения заняты - ждем возврата в пул
+        return self._pool.get()
+    
+    @contextmanager
     def get_connection(self):
         """Получение соединения с БД с поддержкой транзакций"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+        conn = self._acquire_connection()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+    
+    def close(self):
+        """Закрытие всех соединений пула"""
+        with self._pool_lock:
+            while True:
+                try:
+                    conn = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    # Дешевый инкрементальный ANALYZE по статистике соединения
+                    conn.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    self.logger.warning("Ошибка PRAGMA optimize при закрытии: %s", e)
+                conn.close()
+                self._created_connections -= 1
+            while True:
+                try:
+                    conn = self._apsw_pool.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created_apsw_connections -= 1
+    
+    def _create_apsw_connection(self):
+        """Открытие нового соединения apsw для пула отчетных запросов"""
+        conn = apsw.Connection(self.db_path)
+        # Как у sqlite3: ждать снятия блокировки, а не сразу получать BusyError
+        conn.setbusytimeout(5000)
+        conn.execute("PRAGMA cache_size=-65536; PRAGMA temp_store=MEMORY; PRAGMA mmap_size=268435456")
         return conn
+    
+    @contextmanager
+    def _apsw_connection(self):
+        """Соединение apsw из пула (или новое, пока пул не заполнен) на время запроса"""
+        try:
+            conn = self._apsw_pool.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._pool_lock:
+                if self._created_apsw_connections < self.pool_size:
+                    conn = self._create_apsw_connection()
+                    self._created_apsw_connections += 1
+            if conn is None:
+                # Все соединения заняты - ждем возврата в пул
+                conn = self._apsw_pool.get()
+        try:
+            yield conn
+        finally:
+            self._apsw_pool.put(conn)
+    
+    def _read_rows(self, query: str, params, as_dicts: bool) -> List[Any]:
+        """Выполнение запроса на чтение через выбранный драйвер"""
+        if self._driver == 'apsw':
+            with self._apsw_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params)
+                    try:
+                        keys = [description[0] for description in cursor.getdescription()]
+                    except apsw.ExecutionCompleteError:
+                        return []  # Запрос не вернул строк
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            if as_dicts:
+                return [dict(zip(keys, row)) for row in rows]
+            index = {key: position for position, key in enumerate(keys)}
+            return [_ApswRow(index, row) for row in rows]
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return self._fetch_rows(cursor, as_dicts)
+    
+    def _build_products_queries(self) -> Dict[Tuple[int, bool], str]:
+        """Все варианты запроса get_products по битовой маске фильтров и типу пагинации"""
+        conditions = {
+            'category_id': "p.category_id = ?",
+            'min_price': "p.price >= ?",
+            'max_price': "p.price <= ?",
+            'search': "p.product_id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)",
+        }
+        queries = {}
+        for mask in range(1 << len(self.PRODUCT_FILTERS)):
+            for keyset in (False, True):
+                where = [conditions[field] for bit, field in enumerate(self.PRODUCT_FILTERS)
+                         if mask & (1 << bit)]
+                if keyset:
+                    # Продолжение с позиции курсора вместо пропуска строк через OFFSET
+                    where.append("(p.created_at, p.product_id) < (?, ?)")
+                query = """
+                    SELECT p.*, c.name as category_name
+                    FROM products p
+                    LEFT JOIN categories c ON p.category_id = c.category_id
+                """
+                if where:
+                    query += " WHERE " + " AND ".join(where)
+                query += " ORDER BY p.created_at DESC, p.product_id DESC"
+                query += " LIMIT ?" if keyset else " LIMIT ? OFFSET ?"
+                queries[(mask, keyset)] = query
+        return queries
+    
+    def _build_update_product_queries(self) -> Dict[frozenset, str]:
+        """Все варианты UPDATE для продукта по набору обновляемых полей"""
+        queries = {}
+        fields = self.PRODUCT_UPDATE_FIELDS
+        for size in range(1, len(fields) + 1):
+            for combination in itertools.combinations(fields, size):
+                set_clause = ', '.join(f"{field} = ?" for field in combination)
+                queries[frozenset(combination)] = f"UPDATE products SET {set_clause} WHERE product_id = ?"
+        return queries
 
     # === CRUD OPERATIONS ===
     
     def create_category(self, name: str, description: str = "") -> int:
-        """CREATE: Добавление новой категории"""
+        """CREATE: Добавление новой категории (для существующего имени возвращается ее ID)"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO categories (name, description) VALUES (?, ?)",
-                    (name, description)
-                )
-                category_id = cursor.lastrowid
+                if SQLITE_HAS_RETURNING:
+                    # Вставка и получение ID одним запросом, без исключения на дубликате
+                    cursor.execute("""
+                        INSERT INTO categories (name, description) VALUES (?, ?)
+                        ON CONFLICT(name) DO UPDATE SET name = excluded.name
+                        RETURNING category_id
+                    """, (name, description))
+                    category_id = cursor.fetchone()[0]
+                else:
+                    # ON CONFLICT (SQLite 3.24+) гасит только дубликат имени, в отличие от OR IGNORE
+                    cursor.execute("""
+                        INSERT INTO categories (name, description) VALUES (?, ?)
+                        ON CONFLICT(name) DO NOTHING
+                    """, (name, description))
+                    cursor.execute("SELECT category_id FROM categories WHERE name = ?", (name,))
+                    category_id = cursor.fetchone()[0]
                 conn.commit()
-                self.logger.info(f"Создана категория: {name} (ID: {category_id})")
+                self.logger.info("Категория: %s (ID: %s)", name, category_id)
                 return category_id
-        except sqlite3.IntegrityError:
-            self.logger.error(f"Категория с именем '{name}' уже существует")
+        except sqlite3.IntegrityError as e:
+            self.logger.error("Ошибка создания категории '%s': %s", name, e)
             raise
     
     def create_product(self, product_data: Dict[str, Any]) -> int:
@@ -213,131 +657,209 @@ class DatabaseManager:
             raise ValueError(f"Отсутствуют обязательные поля: {required_fields}")
         
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO products (name, description, price, stock_quantity, category_id)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    product_data['name'],
-                    product_data.get('description', ''),
-                    product_data['price'],
-                    product_data.get('stock_quantity', 0),
-                    product_data['category_id']
-                ))
-                product_id = cursor.lastrowid
-                conn.commit()
-                self.logger.info(f"Создан продукт: {product_data['name']} (ID: {product_id})")
-                return product_id
+            product_id = self.create_product_fast(
+                product_data['name'],
+                product_data['price'],
+                product_data['category_id'],
+                product_data.get('description', ''),
+                product_data.get('stock_quantity', 0)
+            )
+            self.logger.info("Создан продукт: %s (ID: %s)", product_data['name'], product_id)
+            return product_id
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка создания продукта: {e}")
+            self.logger.error("Ошибка создания продукта: %s", e)
             raise
     
+    def create_product_fast(self, name: str, price: float, category_id: int,
+                            description: str = '', stock_quantity: int = 0) -> int:
+        """CREATE: Добавление продукта из позиционных значений, без разбора словаря"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(self._insert_product_sql,
+                                  (name, description, price, stock_quantity, category_id))
+            return cursor.lastrowid
+    
     def batch_create_products(self, products: List[Dict[str, Any]]) -> bool:
         """CREATE: Пакетное добавление продуктов в транзакции"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                for product in products:
-                    cursor.execute("""
-                        INSERT INTO products (name, description, price, stock_quantity, category_id)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
+                # Один подготовленный запрос на весь пакет вместо execute на каждую строку
+                rows = (
+                    (
                         product['name'],
                         product.get('description', ''),
                         product['price'],
                         product.get('stock_quantity', 0),
                         product['category_id']
-                    ))
+                    )
+                    for product in products
+                )
+                bulk_mode = (self._bulk_load_mode(conn, 'products', atomic=True)
+                             if len(products) > self.BULK_LOAD_THRESHOLD else nullcontext())
+                with bulk_mode:
+                    cursor.executemany(self._insert_product_sql, rows)
                 conn.commit()
-                self.logger.info(f"Пакетно добавлено {len(products)} продуктов")
+                self.logger.info("Пакетно добавлено %s продуктов", len(products))
                 return True
         except sqlite3.Error as e:
-            conn.rollback()
-            self.logger.error(f"Ошибка пакетного добавления: {e}")
+            self.logger.error("Ошибка пакетного добавления: %s", e)
             return False
     
     def get_products(self, filters: Dict[str, Any] = None, 
-                    page: int = 1, per_page: int = 10) -> List[Dict]:
-        """READ: Получение продуктов с фильтрацией и пагинацией"""
+                    page: int = 1, per_page: int = 10,
+                    after: Optional[Tuple[str, int]] = None,
+                    as_dicts: bool = False) -> List[Any]:
+        """READ: Получение продуктов с фильтрацией и пагинацией
+        
+        after - курсор (created_at, product_id) последнего полученного продукта;
+        если задан, выборка продолжается после него и page не используется.
+        as_dicts - вернуть словари вместо sqlite3.Row (доступ по имени есть у обоих).
+        """
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Базовый запрос
-                query = """
-                    SELECT p.*, c.name as category_name
-                    FROM products p
-                    LEFT JOIN categories c ON p.category_id = c.category_id
-                    WHERE 1=1
-                """
+                # Применение фильтров: маска выбирает готовый вариант запроса
+                mask = 0
                 params = []
-                
-                # Применение фильтров
                 if filters:
-                    if 'category_id' in filters:
-                        query += " AND p.category_id = ?"
-                        params.append(filters['category_id'])
-                    if 'min_price' in filters:
-                        query += " AND p.price >= ?"
-                        params.append(filters['min_price'])
-                    if 'max_price' in filters:
-                        query += " AND p.price <= ?"
-                        params.append(filters['max_price'])
-                    if 'search' in filters:
-                        query += " AND (p.name LIKE ? OR p.description LIKE ?)"
-                        params.extend([f"%{filters['search']}%", f"%{filters['search']}%"])
-                
-                # Сортировка и пагинация
-                query += " ORDER BY p.created_at DESC"
-                query += " LIMIT ? OFFSET ?"
-                params.extend([per_page, (page - 1) * per_page])
-                
-                cursor.execute(query, params)
-                products = [dict(row) for row in cursor.fetchall()]
-                
-                self.logger.info(f"Получено {len(products)} продуктов (страница {page})")
+                    for bit, field in enumerate(self.PRODUCT_FILTERS):
+                        if field not in filters:
+                            continue
+                        value = filters[field]
+                        if field == 'search':
+                            value = self._fts_query(value)
+                            if value is None:
+                                # В строке поиска нет слов - как LIKE '%%', фильтр не ограничивает выборку
+                                continue
+                        mask |= 1 << bit
+                        params.append(value)
+                
+                # Пагинация: по курсору или по номеру страницы
+                if after is not None:
+                    params.extend([after[0], after[1], per_page])
+                else:
+                    params.extend([per_page, (page - 1) * per_page])
+                
+                cursor.execute(self._products_queries[(mask, after is not None)], params)
+                products = self._fetch_rows(cursor, as_dicts)
+                
+                if after is not None:
+                    self.logger.info("Получено %s продуктов (после %s)", len(products), after)
+                else:
+                    self.logger.info("Получено %s продуктов (страница %s)", len(products), page)
                 return products
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка получения продуктов: {e}")
+            self.logger.error("Ошибка получения продуктов: %s", e)
             return []
     
+    def get_products_page(self, filters: Dict[str, Any] = None, per_page: int = 10,
+                          after: Optional[Tuple[str, int]] = None,
+                          as_dicts: bool = False
+                          ) -> Tuple[List[Any], Optional[Tuple[str, int]]]:
+        """READ: Страница продуктов и курсор для запроса следующей страницы"""
+        products = self.get_products(filters, per_page=per_page, after=after, as_dicts=as_dicts)
+        if len(products) < per_page:
+            return products, None
+        last = products[-1]
+        return products, (last['created_at'], last['product_id'])
+    
+    @staticmethod
+    def _fetch_rows(cursor, as_dicts: bool) -> List[Any]:
+        """Результат запроса: sqlite3.Row как есть или словари по запросу вызывающего"""
+        if as_dicts:
+            return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
+    
+    @staticmethod
+    def _fts_query(search: str) -> Optional[str]:
+        """Преобразование строки поиска в запрос FTS5: слова от 2 символов как префиксы"""
+        tokens = re.findall(r'\w+', str(search))
+        if not tokens:
+            return None
+        # Однобуквенное слово ищется целиком: префикс "C"* нашел бы и "Cable" по запросу "C++"
+        return ' '.join(f'"{token}"*' if len(token) > 1 else f'"{token}"' for token in tokens)
+    
     def update_product(self, product_id: int, update_data: Dict[str, Any]) -> bool:
         """UPDATE: Обновление данных продукта"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Проверка существования продукта
-                cursor.execute("SELECT 1 FROM products WHERE product_id = ?", (product_id,))
-                if not cursor.fetchone():
-                    self.logger.warning(f"Продукт с ID {product_id} не найден")
+                # Выбор готового запроса обновления по набору полей
+                fields = [field for field in self.PRODUCT_UPDATE_FIELDS if field in update_data]
+                if not fields:
+                    self.logger.warning("Нет полей для обновления")
                     return False
                 
-                # Формирование запроса обновления
-                set_clause = []
-                params = []
-                for field, value in update_data.items():
-                    if field in ['name', 'description', 'price', 'stock_quantity', 'category_id']:
-                        set_clause.append(f"{field} = ?")
-                        params.append(value)
+                params = [update_data[field] for field in fields]
+                params.append(product_id)
                 
-                if not set_clause:
-                    self.logger.warning("Нет полей для обновления")
+                cursor.execute(self._update_product_queries[frozenset(fields)], params)
+                # Существование продукта проверяется по числу затронутых строк, без отдельного SELECT
+                if cursor.rowcount == 0:
+                    self.logger.warning("Продукт с ID %s не найден", product_id)
                     return False
+                conn.commit()
                 
-                params.append(product_id)
-                query = f"UPDATE products SET {', '.join(set_clause)} WHERE product_id = ?"
+                self.logger.info("Обновлен продукт ID %s", product_id)
+                return True
                 
-                cursor.execute(query, params)
+        except sqlite3.Error as e:
+            self.logger.error("Ошибка обновления продукта: %s", e)
+            return False
+    
+    def bulk_update_products(self, updates: List[Tuple[int, Dict[str, Any]]]) -> bool:
+        """UPDATE: Пакетное обновление продуктов одним UPDATE с CASE на каждый набор полей"""
+        # Повторные обновления одного продукта объединяются, последнее значение побеждает
+        merged: Dict[int, Dict[str, Any]] = {}
+        for product_id, update_data in updates:
+            merged.setdefault(product_id, {}).update(update_data)
+        
+        # Группировка продуктов по набору обновляемых полей
+        groups: Dict[Tuple[str, ...], List[Tuple[int, Dict[str, Any]]]] = {}
+        for product_id, update_data in merged.items():
+            fields = tuple(field for field in self.PRODUCT_UPDATE_FIELDS if field in update_data)
+            if fields:
+                groups.setdefault(fields, []).append((product_id, update_data))
+        
+        if not groups:
+            self.logger.warning("Нет полей для обновления")
+            return False
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                affected_rows = 0
+                for fields, items in groups.items():
+                    # На продукт: пара (ID, значение) для каждого поля и ID в списке IN
+                    chunk_size = max(1, self.MAX_SQL_VARIABLES // (2 * len(fields) + 1))
+                    for start in range(0, len(items), chunk_size):
+                        chunk = items[start:start + chunk_size]
+                        when_clause = ' '.join(['WHEN ? THEN ?'] * len(chunk))
+                        set_clause = ', '.join(
+                            f"{field} = CASE product_id {when_clause} END" for field in fields
+                        )
+                        placeholders = ', '.join(['?'] * len(chunk))
+                        params = []
+                        for field in fields:
+                            for product_id, update_data in chunk:
+                                params.extend([product_id, update_data[field]])
+                        params.extend(product_id for product_id, _ in chunk)
+                        
+                        cursor.execute(
+                            f"UPDATE products SET {set_clause} WHERE product_id IN ({placeholders})",
+                            params
+                        )
+                        affected_rows += cursor.rowcount
                 conn.commit()
                 
-                self.logger.info(f"Обновлен продукт ID {product_id}")
+                self.logger.info("Пакетно обновлено %s продуктов", affected_rows)
                 return True
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка обновления продукта: {e}")
+            self.logger.error("Ошибка пакетного обновления продуктов: %s", e)
             return False
     
     def bulk_update_prices(self, category_id: int, increase_percent: float) -> bool:
@@ -354,12 +876,11 @@ class DatabaseManager:
                 affected_rows = cursor.rowcount
                 conn.commit()
                 
-                self.logger.info(f"Обновлены цены для {affected_rows} продуктов в категории {category_id}")
+                self.logger.info("Обновлены цены для %s продуктов в категории %s", affected_rows, category_id)
                 return True
                 
         except sqlite3.Error as e:
-            conn.rollback()
-            self.logger.error(f"Ошибка массового обновления цен: {e}")
+            self.logger.error("Ошибка массового обновления цен: %s", e)
             return False
     
     def delete_product(self, product_id: int) -> bool:
@@ -377,90 +898,92 @@ class DatabaseManager:
                 result = cursor.fetchone()
                 
                 if result['order_count'] > 0:
-                    self.logger.warning(f"Невозможно удалить продукт ID {product_id} - есть связанные заказы")
+                    self.logger.warning("Невозможно удалить продукт ID %s - есть связанные заказы", product_id)
                     return False
                 
                 cursor.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
                 conn.commit()
                 
-                self.logger.info(f"Удален продукт ID {product_id}")
+                self.logger.info("Удален продукт ID %s", product_id)
                 return True
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка удаления продукта: {e}")
+            self.logger.error("Ошибка удаления продукта: %s", e)
             return False
     
     def truncate_table(self, table_name: str) -> bool:
         """DELETE: Очистка таблицы с сохранением структуры"""
-        allowed_tables = ['products', 'categories', 'customers', 'orders', 'order_items']
-        if table_name not in allowed_tables:
-            self.logger.error(f"Недопустимое имя таблицы для очистки: {table_name}")
+        table_sql = self._sql.get(table_name)
+        if table_sql is None:
+            self.logger.error("Недопустимое имя таблицы для очистки: %s", table_name)
             return False
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(f"DELETE FROM {table_name}")
-                cursor.execute(f"DELETE FROM sqlite_sequence WHERE name = ?", (table_name,))
+                cursor.execute(table_sql['truncate_rows'])
+                cursor.execute(table_sql['truncate_seq'], (table_name,))
                 conn.commit()
                 
-                self.logger.info(f"Очищена таблица {table_name}")
+                self.logger.info("Очищена таблица %s", table_name)
                 return True
                 
         except sqlite3.Error as e:
-            conn.rollback()
-            self.logger.error(f"Ошибка очистки таблицы: {e}")
+            self.logger.error("Ошибка очистки таблицы: %s", e)
             return False
 
     # === COMPLEX QUERIES ===
     
-    def get_sales_report(self, start_date: str = None, end_date: str = None) -> List[Dict]:
+    def get_sales_report(self, start_date: str = None, end_date: str = None,
+                         as_dicts: bool = False) -> List[Any]:
         """Сложный запрос: отчет по продажам с GROUP BY и агрегатными функциями"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                query = """
-                    SELECT 
-                        c.name as category_name,
-                        COUNT(oi.order_item_id) as items_sold,
-                        SUM(oi.quantity) as total_quantity,
-                        SUM(oi.subtotal) as total_revenue,
-                        AVG(oi.unit_price) as avg_price,
-                        MAX(oi.unit_price) as max_price,
-                        MIN(oi.unit_price) as min_price
-                    FROM order_items oi
-                    JOIN products p ON oi.product_id = p.product_id
-                    JOIN categories c ON p.category_id = c.category_id
-                    JOIN orders o ON oi.order_id = o.order_id
-                    WHERE o.status != 'cancelled'
-                """
-                params = []
-                
-                if start_date:
-                    query += " AND o.order_date >= ?"
-                    params.append(start_date)
-                if end_date:
-                    query += " AND o.order_date <= ?"
-                    params.append(end_date)
-                
-                query += " GROUP BY c.category_id, c.name ORDER BY total_revenue DESC"
-                
-                cursor.execute(query, params)
-                report = [dict(row) for row in cursor.fetchall()]
-                
-                self.logger.info(f"Сформирован отчет по продажам: {len(report)} категорий")
-                return report
-                
-        except sqlite3.Error as e:
-            self.logger.error(f"Ошибка формирования отчета: {e}")
+            query = """
+                SELECT 
+                    c.name as category_name,
+                    COUNT(oi.order_item_id) as items_sold,
+                    SUM(oi.quantity) as total_quantity,
+                    SUM(oi.subtotal) as total_revenue,
+                    AVG(oi.unit_price) as avg_price,
+                    MAX(oi.unit_price) as max_price,
+                    MIN(oi.unit_price) as min_price
+                FROM order_items oi
+                JOIN products p ON oi.product_id = p.product_id
+                JOIN categories c ON p.category_id = c.category_id
+                JOIN orders o ON oi.order_id = o.order_id
+                WHERE o.status != 'cancelled'
+            """
+            params = []
+            
+            if start_date:
+                query += " AND o.order_date >= ?"
+                params.append(start_date)
+            if end_date:
+                query += " AND o.order_date <= ?"
+                params.append(end_date)
+            
+            query += " GROUP BY c.category_id, c.name ORDER BY total_revenue DESC"
+            
+            report = self._read_rows(query, params, as_dicts)
+            
+            self.logger.info("Сформирован отчет по продажам: %s категорий", len(report))
+            return report
+            
+        except DB_ERRORS as e:
+            self.logger.error("Ошибка формирования отчета: %s", e)
             return []
     
-    def get_customer_orders(self, customer_id: int) -> List[Dict]:
-        """Сложный запрос: заказы клиента с JOIN и подзапросами"""
+    def get_customer_orders(self, customer_id: int, as_dicts: bool = True) -> List[Dict]:
+        """Сложный запрос: заказы клиента с JOIN, агрегацией и пакетной выборкой товаров"""
+        # К заказам добавляется product_names, поэтому вернуть sqlite3.Row нельзя
+        if not as_dicts:
+            raise ValueError("get_customer_orders возвращает только словари (as_dicts=True)")
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                # Оба запроса читают один снимок данных
+                cursor.execute("BEGIN")
                 
                 query = """
                     SELECT 
@@ -468,11 +991,9 @@ class DatabaseManager:
                         o.order_date,
                         o.status,
                         o.total_amount,
-                        (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.order_id) as item_count,
-                        GROUP_CONCAT(p.name, ', ') as product_names
+                        COUNT(oi.order_item_id) as item_count
                     FROM orders o
                     LEFT JOIN order_items oi ON o.order_id = oi.order_id
-                    LEFT JOIN products p ON oi.product_id = p.product_id
                     WHERE o.customer_id = ?
                     GROUP BY o.order_id
                     ORDER BY o.order_date DESC
@@ -481,103 +1002,247 @@ class DatabaseManager:
                 cursor.execute(query, (customer_id,))
                 orders = [dict(row) for row in cursor.fetchall()]
                 
-                self.logger.info(f"Получено {len(orders)} заказов для клиента {customer_id}")
+                # Названия товаров одной выборкой по списку заказов (порциями в пределах лимита параметров)
+                products_by_order: Dict[int, List[str]] = {}
+                order_ids = [order['order_id'] for order in orders if order['item_count']]
+                for start in range(0, len(order_ids), self.MAX_SQL_VARIABLES):
+                    chunk = order_ids[start:start + self.MAX_SQL_VARIABLES]
+                    placeholders = ', '.join(['?'] * len(chunk))
+                    cursor.execute(f"""
+                        SELECT oi.order_id, p.name
+                        FROM order_items oi
+                        JOIN products p ON oi.product_id = p.product_id
+                        WHERE oi.order_id IN ({placeholders})
+                        ORDER BY oi.order_item_id
+                    """, chunk)
+                    for order_id, name in cursor.fetchall():
+                        products_by_order.setdefault(order_id, []).append(name)
+                
+                for order in orders:
+                    names = products_by_order.get(order['order_id'])
+                    order['product_names'] = ', '.join(names) if names else None
+                
+                self.logger.info("Получено %s заказов для клиента %s", len(orders), customer_id)
                 return orders
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка получения заказов клиента: {e}")
+            self.logger.error("Ошибка получения заказов клиента: %s", e)
             return []
     
-    def get_popular_products(self, limit: int = 5) -> List[Dict]:
-        """Сложный запрос: популярные продукты с использованием подзапросов"""
+    def get_popular_products(self, limit: int = 5, as_dicts: bool = False) -> List[Any]:
+        """Сложный запрос: популярные продукты по сводке продаж, поддерживаемой триггерами"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                query = """
-                    WITH product_sales AS (
-                        SELECT 
-                            p.product_id,
-                            p.name,
-                            p.price,
-                            c.name as category_name,
-                            SUM(oi.quantity) as total_sold,
-                            SUM(oi.subtotal) as total_revenue
-                        FROM products p
-                        LEFT JOIN order_items oi ON p.product_id = oi.product_id
-                        LEFT JOIN orders o ON oi.order_id = o.order_id AND o.status != 'cancelled'
-                        LEFT JOIN categories c ON p.category_id = c.category_id
-                        GROUP BY p.product_id
-                    )
-                    SELECT * FROM product_sales
-                    ORDER BY total_sold DESC, total_revenue DESC
-                    LIMIT ?
-                """
-                
-                cursor.execute(query, (limit,))
-                products = [dict(row) for row in cursor.fetchall()]
-                
-                self.logger.info(f"Получено {len(products)} популярных продуктов")
-                return products
-                
-        except sqlite3.Error as e:
-            self.logger.error(f"Ошибка получения популярных продуктов: {e}")
+            query = """
+                SELECT 
+                    p.product_id,
+                    p.name,
+                    p.price,
+                    c.name as category_name,
+                    s.total_sold,
+                    ROUND(s.total_revenue, 2) as total_revenue
+                FROM product_sales_summary s
+                JOIN products p ON s.product_id = p.product_id
+                LEFT JOIN categories c ON p.category_id = c.category_id
+                ORDER BY s.total_sold DESC, s.total_revenue DESC
+                LIMIT ?
+            """
+            
+            products = self._read_rows(query, (limit,), as_dicts)
+            
+            self.logger.info("Получено %s популярных продуктов", len(products))
+            return products
+            
+        except DB_ERRORS as e:
+            self.logger.error("Ошибка получения популярных продуктов: %s", e)
             return []
 
     # === DATA IMPORT/EXPORT ===
     
     def import_csv_to_table(self, csv_file: str, table_name: str, 
                           mapping: Dict[str, str] = None) -> bool:
-        """Импорт данных из CSV с валидацией и преобразованием"""
+        """Импорт данных из CSV с валидацией и преобразованием
+        
+        Файл больше BULK_LOAD_THRESHOLD строк загружается без вторичных индексов
+        таблицы: их удаление фиксируется до загрузки, и на все время импорта другие
+        соединения работают с таблицей без этих индексов (запросы медленнее).
+        Индексы создаются заново после импорта, в том числе при ошибке. Если процесс
+        аварийно завершится во время импорта, init_database при следующем запуске
+        восстановит только свои индексы - созданные вручную придется создать заново.
+        """
+        if table_name not in self._sql:
+            self.logger.error("Недопустимое имя таблицы для импорта: %s", table_name)
+            return False
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                with open(csv_file, 'r', encoding='utf-8') as file:
+                with open(csv_file, 'r', encoding='utf-8', newline='') as file:
                     csv_reader = csv.DictReader(file)
                     
-                    for row_num, row in enumerate(csv_reader, 1):
-                        try:
-                            # Преобразование данных
-                            if mapping:
-                                mapped_data = {}
-                                for csv_field, db_field in mapping.items():
-                                    if csv_field in row:
-                                        mapped_data[db_field] = row[csv_field]
-                            else:
-                                mapped_data = row
-                            
-                            # Валидация и вставка
-                            placeholders = ', '.join(['?' for _ in mapped_data])
-                            columns = ', '.join(mapped_data.keys())
-                            values = list(mapped_data.values())
+                    # Колонки определяются один раз по заголовку файла
+                    header = csv_reader.fieldnames or []
+                    if mapping:
+                        csv_fields = [field for field in mapping if field in header]
+                        db_fields = [mapping[field] for field in csv_fields]
+                    else:
+                        csv_fields = db_fields = list(header)
+                    
+                    if not csv_fields:
+                        self.logger.warning("Нет колонок для импорта в таблицу %s", table_name)
+                        return False
+                    
+                    # Без вторичных индексов на время большой загрузки; порции фиксируются
+                    # по отдельности, поэтому удаление индексов фиксируется сразу
+                    bulk_mode = (self._bulk_load_mode(conn, table_name)
+                                 if self._csv_has_more_rows(csv_file, self.BULK_LOAD_THRESHOLD)
+                                 else nullcontext())
+                    with bulk_mode:
+                        # Импорт целиком внутри SQLite, если доступно расширение csv
+                        if self._csv_extension_available and self._import_csv_native(
+                                conn, csv_file, table_name, csv_fields, db_fields):
+                            self.logger.info("Импорт CSV в таблицу %s завершен", table_name)
+                            return True
+                        
+                        query = insert_sql(table_name, tuple(db_fields))
+                        
+                        # Вставка порциями: каждая порция - отдельная транзакция
+                        rows = (csv_row_to_tuple(row, csv_fields) for row in csv_reader)
+                        row_num = 0
+                        skipped = 0
+                        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+                        while True:
+                            chunk = list(itertools.islice(rows, self.CSV_IMPORT_CHUNK_SIZE))
+                            if not chunk:
+                                break
                             
-                            cursor.execute(
-                                f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
-                                values
-                            )
+                            try:
+                                cursor.executemany(query, chunk)
+                            except sqlite3.Error:
+                                # Порция с ошибкой повторяется построчно, чтобы пропустить только плохие строки
+                                conn.rollback()
+                                for offset, values in enumerate(chunk, 1):
+                                    try:
+                                        cursor.execute(query, values)
+                                    except sqlite3.Error as e:
+                                        skipped += 1
+                                        if debug_enabled:
+                                            self.logger.debug("Пропуск строки %s: %s", row_num + offset, e)
                             
-                        except (ValueError, sqlite3.Error) as e:
-                            self.logger.warning(f"Пропуск строки {row_num}: {e}")
-                            continue
-                
+                            conn.commit()
+                            row_num += len(chunk)
+                    
                 conn.commit()
-                self.logger.info(f"Импорт CSV в таблицу {table_name} завершен")
+                if skipped:
+                    self.logger.warning("Пропущено %s из %s строк при импорте в таблицу %s",
+                                        skipped, row_num, table_name)
+                self.logger.info("Импорт CSV в таблицу %s завершен", table_name)
                 return True
                 
         except Exception as e:
+            self.logger.error("Ошибка импорта CSV: %s", e)
+            return False
+    
+    @staticmethod
+    def _csv_has_more_rows(csv_file: str, limit: int) -> bool:
+        """Быстрая проверка, что в CSV больше limit строк данных (по переводам строк)
+        
+        Чтение останавливается, как только порог превышен, - большой файл
+        не читается целиком ради подсчета.
+        """
+        newlines = 0
+        with open(csv_file, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                newlines += block.count(b'\n')
+                # Первая строка - заголовок
+                if newlines - 1 > limit:
+                    return True
+        return False
+    
+    @contextmanager
+    def _bulk_load_mode(self, conn: sqlite3.Connection, table_name: str, atomic: bool = False):
+        """Удаление вторичных индексов таблицы на время массовой загрузки
+        
+        Индексы (кроме PRIMARY KEY и UNIQUE) удаляются перед загрузкой и создаются
+        заново после нее по сохраненному DDL: построение индекса сортировкой
+        дешевле, чем обновление B-дерева на каждой вставке.
+        
+        atomic=True: удаление индексов, загрузка и их восстановление идут в одной
+        явной транзакции - другие соединения не видят таблицу без индексов, а при
+        ошибке откат возвращает и данные, и индексы. Загрузка не должна фиксировать
+        транзакцию сама.
+        
+        atomic=False (порционный импорт CSV со своими commit): DROP INDEX фиксируется
+        сразу, и до конца загрузки таблица видна другим соединениям без индексов.
+        При ошибке откатывается только текущая порция, уже зафиксированные порции
+        остаются, а индексы создаются заново в любом случае.
+        """
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA index_list({table_name})")
+        index_names = {row['name'] for row in cursor.fetchall()
+                       if not row['unique'] and row['origin'] == 'c'}
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            (table_name,)
+        )
+        indexes = [(row['name'], row['sql']) for row in cursor.fetchall()
+                   if row['name'] in index_names]
+        
+        if atomic:
+            # sqlite3 не открывает транзакцию перед DDL сам - без BEGIN каждый DROP фиксировался бы отдельно
+            cursor.execute("BEGIN")
+        for name, _ in indexes:
+            cursor.execute('DROP INDEX "' + name.replace('"', '""') + '"')
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            if not atomic:
+                # Удаление индексов уже зафиксировано - восстанавливаем их явно
+                for _, index_sql in indexes:
+                    cursor.execute(index_sql)
+                conn.commit()
+            raise
+        for _, index_sql in indexes:
+            cursor.execute(index_sql)
+        conn.commit()
+    
+    def _import_csv_native(self, conn: sqlite3.Connection, csv_file: str, table_name: str,
+                           csv_fields: List[str], db_fields: List[str]) -> bool:
+        """Импорт CSV через виртуальную таблицу csv одним INSERT ... SELECT
+        
+        Возвращает False, если импорт не удался: тогда вызывающий код
+        выполняет построчный импорт с пропуском некорректных строк.
+        """
+        cursor = conn.cursor()
+        filename = csv_file.replace("'", "''")
+        columns = ', '.join(db_fields)
+        source_columns = ', '.join('"' + field.replace('"', '""') + '"' for field in csv_fields)
+        try:
+            cursor.execute("DROP TABLE IF EXISTS temp.csv_in")
+            cursor.execute(f"CREATE VIRTUAL TABLE temp.csv_in USING csv(filename='{filename}', header=YES)")
+            cursor.execute(f"INSERT INTO {table_name} ({columns}) SELECT {source_columns} FROM temp.csv_in")
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
             conn.rollback()
-            self.logger.error(f"Ошибка импорта CSV: {e}")
+            self.logger.debug("Импорт через расширение csv не выполнен: %s", e)
             return False
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS temp.csv_in")
     
     def import_json_to_table(self, json_file: str, table_name: str) -> bool:
         """Импорт данных из JSON с парсингом сложных структур"""
+        if table_name not in self._sql:
+            self.logger.error("Недопустимое имя таблицы для импорта: %s", table_name)
+            return False
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                with open(json_file, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
+                with open(json_file, 'rb') as file:
+                    data = _json_loads(file.read())
                     
                     if isinstance(data, list):
                         for item in data:
@@ -586,66 +1251,60 @@ class DatabaseManager:
                         self._insert_json_item(cursor, table_name, data)
                 
                 conn.commit()
-                self.logger.info(f"Импорт JSON в таблицу {table_name} завершен")
+                self.logger.info("Импорт JSON в таблицу %s завершен", table_name)
                 return True
                 
         except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Ошибка импорта JSON: {e}")
+            self.logger.error("Ошибка импорта JSON: %s", e)
             return False
     
     def _insert_json_item(self, cursor, table_name: str, item: Dict):
         """Вспомогательный метод для вставки элемента JSON"""
         try:
             # Преобразование JSON-структур
-            flattened_item = {}
-            for key, value in item.items():
-                if isinstance(value, (dict, list)):
-                    flattened_item[key] = json.dumps(value, ensure_ascii=False)
-                else:
-                    flattened_item[key] = value
-            
-            placeholders = ', '.join(['?' for _ in flattened_item])
-            columns = ', '.join(flattened_item.keys())
-            values = list(flattened_item.values())
-            
-            cursor.execute(
-                f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
-                values
-            )
+            columns, values = flatten_json_item(item)
+            cursor.execute(insert_sql(table_name, columns), values)
             
         except sqlite3.Error as e:
-            self.logger.warning(f"Ошибка вставки элемента JSON: {e}")
+            self.logger.warning("Ошибка вставки элемента JSON: %s", e)
             raise
     
     def export_table_to_csv(self, table_name: str, output_file: str, 
                           delimiter: str = ',') -> bool:
         """Экспорт таблицы в CSV с настраиваемым разделителем"""
+        table_sql = self._sql.get(table_name)
+        if table_sql is None:
+            self.logger.error("Недопустимое имя таблицы для экспорта: %s", table_name)
+            return False
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(f"SELECT * FROM {table_name}")
-                rows = cursor.fetchall()
+                cursor.arraysize = self.EXPORT_CHUNK_SIZE
+                cursor.execute(table_sql['select_all'])
+                rows = cursor.fetchmany()
                 
                 if not rows:
-                    self.logger.warning(f"Таблица {table_name} пуста")
+                    self.logger.warning("Таблица %s пуста", table_name)
                     return False
                 
-                with open(output_file, 'w', newline='', encoding='utf-8') as file:
+                with open(output_file, 'w', newline='', encoding='utf-8',
+                          buffering=1 << 20) as file:
                     writer = csv.writer(file, delimiter=delimiter)
                     
                     # Заголовки
                     writer.writerow([description[0] for description in cursor.description])
                     
-                    # Данные
-                    for row in rows:
-                        writer.writerow(row)
+                    # Данные порциями, без загрузки всей таблицы в память
+                    while rows:
+                        writer.writerows(rows)
+                        rows = cursor.fetchmany()
                 
-                self.logger.info(f"Экспорт таблицы {table_name} в {output_file} завершен")
+                self.logger.info("Экспорт таблицы %s в %s завершен", table_name, output_file)
                 return True
                 
         except Exception as e:
-            self.logger.error(f"Ошибка экспорта в CSV: {e}")
+            self.logger.error("Ошибка экспорта в CSV: %s", e)
             return False
     
     def export_query_to_json(self, query: str, output_file: str, 
@@ -654,32 +1313,62 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.arraysize = self.EXPORT_CHUNK_SIZE
                 cursor.execute(query, params or ())
-                rows = [dict(row) for row in cursor.fetchall()]
+                # Имена колонок вычисляются один раз, а не для каждой строки
+                keys = [description[0] for description in cursor.description]
                 
-                with open(output_file, 'w', encoding='utf-8') as file:
-                    json.dump(rows, file, ensure_ascii=False, indent=2, 
-                             default=str)  # Для обработки datetime
+                # Потоковая запись массива JSON порциями строк
+                with open(output_file, 'wb') as file:
+                    file.write(b'[')
+                    separator = b'\n'
+                    rows = cursor.fetchmany()
+                    while rows:
+                        for row in rows:
+                            item = _json_dumps_pretty(dict(zip(keys, row)))
+                            file.write(separator + b'  ' + item.replace(b'\n', b'\n  '))
+                            separator = b',\n'
+                        rows = cursor.fetchmany()
+                    file.write(b']' if separator == b'\n' else b'\n]')
                 
-                self.logger.info(f"Экспорт запроса в {output_file} завершен")
+                self.logger.info("Экспорт запроса в %s завершен", output_file)
                 return True
                 
         except Exception as e:
-            self.logger.error(f"Ошибка экспорта в JSON: {e}")
+            self.logger.error("Ошибка экспорта в JSON: %s", e)
             return False
 
     # === DATABASE MAINTENANCE ===
     
     def optimize_database(self):
-        """Оптимизация базы данных: перестройка индексов и анализ"""
+        """Оптимизация базы данных: анализ только устаревшей статистики (PRAGMA optimize)"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("ANALYZE")
-                cursor.execute("VACUUM")
+                cursor.execute("PRAGMA optimize")
                 self.logger.info("Оптимизация базы данных завершена")
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка оптимизации БД: {e}")
+            self.logger.error("Ошибка оптимизации БД: %s", e)
+    
+    def full_vacuum(self) -> threading.Thread:
+        """Полное обслуживание (ANALYZE и VACUUM) в фоновом потоке, не блокируя вызывающий код"""
+        thread = threading.Thread(target=self._run_full_vacuum,
+                                  name="db-maintenance", daemon=True)
+        thread.start()
+        return thread
+    
+    def _run_full_vacuum(self):
+        """ANALYZE и VACUUM на отдельном соединении вне пула"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("ANALYZE")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+            self.logger.info("Полное обслуживание базы данных завершено")
+        except sqlite3.Error as e:
+            self.logger.error("Ошибка полного обслуживания БД: %s", e)
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Статистика базы данных для мониторинга производительности"""
@@ -689,15 +1378,10 @@ class DatabaseManager:
                 
                 stats = {}
                 
-                # Размер БД
-                cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
-                stats['database_size'] = cursor.fetchone()[0]
-                
-                # Количество записей в таблицах
-                tables = ['products', 'categories', 'customers', 'orders', 'order_items']
-                for table in tables:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    stats[f'{table}_count'] = cursor.fetchone()[0]
+                # Размер БД и количество записей в таблицах
+                cursor.execute(self._stats_sql)
+                for key, value in cursor.fetchall():
+                    stats[key] = value
                 
                 # Использование индексов
                 cursor.execute("""
@@ -710,7 +1394,7 @@ class DatabaseManager:
                 return stats
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Ошибка сбора статистики: {e}")
+            self.logger.error("Ошибка сбора статистики: %s", e)
             return {}
 
 # === ДЕМОНСТРАЦИЯ РАБОТЫ СИСТЕМЫ ===
@@ -811,27 +1495,12 @@ if __name__ == "__main__":
     db.truncate_table('categories')
     db.truncate_table('customers')
     
-    # Категории - создаем с проверкой
-    try:
-        electronics_id = db.create_category("Электроника", "Техника и гаджеты")
-        print("✓ Создана категория: Электроника")
-    except sqlite3.IntegrityError:
-        # Если категория уже существует, получаем её ID
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT category_id FROM categories WHERE name = ?", ("Электроника",))
-            electronics_id = cursor.fetchone()[0]
-        print("✓ Используем существующую категорию: Электроника")
+    # Категории - для существующего имени create_category возвращает ее ID
+    electronics_id = db.create_category("Электроника", "Техника и гаджеты")
+    print("✓ Категория: Электроника")
     
-    try:
-        books_id = db.create_category("Книги", "Художественная и учебная литература")
-        print("✓ Создана категория: Книги")
-    except sqlite3.IntegrityError:
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT category_id FROM categories WHERE name = ?", ("Книги",))
-            books_id = cursor.fetchone()[0]
-        print("✓ Используем существующую категорию: Книги")
+    books_id = db.create_category("Книги", "Художественная и учебная литература")
+    print("✓ Категория: Книги")
     
     # Продукты
     products_data = [
@@ -0,0 +1,25 @@
+"""
+Сборка скомпилированной версии горячих циклов импорта:
+
+    pip install mypy
+    python setup.py build_ext --inplace
+
+Без mypy пакет устанавливается как обычные модули Python,
+и bd.py использует _fastpath.py без компиляции.
+"""
+from setuptools import setup
+
+try:
+    from mypyc.build import mypycify
+except ImportError:
+    mypycify = None
+
+if mypycify is not None:
+    modules = {'py_modules': ['bd'], 'ext_modules': mypycify(['_fastpath.py'])}
+else:
+    modules = {'py_modules': ['bd', '_fastpath']}
+
+setup(
+    name='ecommerce-db-system',
+    **modules,
+)
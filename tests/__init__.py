@@ -0,0 +1,27 @@
+"""
+Тесты DatabaseManager.
+
+Запуск из корня репозитория: python -m unittest
+"""
+import os
+import tempfile
+import unittest
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Базовый класс тестов: каждая БД - во временном каталоге класса"""
+
+    @classmethod
+    def setUpClass(cls):
+        # setup_logging пишет database_operations.log в текущий каталог - уводим его во временный
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._cwd = os.getcwd()
+        os.chdir(cls._tmpdir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls._cwd)
+        cls._tmpdir.cleanup()
+
+    def setUp(self):
+        self.db_path = os.path.join(self._tmpdir.name, f'{self.id()}.db')
@@ -0,0 +1,46 @@
+"""Фильтр search в get_products: полнотекстовый поиск по названию и описанию"""
+import unittest
+
+import bd
+from tests import DatabaseTestCase
+
+
+class ProductSearchTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.db = bd.DatabaseManager(self.db_path, driver='sqlite3')
+        category_id = self.db.create_category('Электроника')
+        self.db.create_product_fast('iPhone 13', 799.99, category_id, 'Смартфон Apple')
+        self.db.create_product_fast('Cable USB', 9.99, category_id, 'Кабель для зарядки')
+        self.db.create_product_fast('Учебник C', 30.0, category_id, 'Язык программирования C')
+
+    def tearDown(self):
+        self.db.close()
+
+    def search(self, text: str):
+        return sorted(row['name'] for row in self.db.get_products({'search': text}))
+
+    def test_search_without_words_does_not_filter(self):
+        everything = ['Cable USB', 'iPhone 13', 'Учебник C']
+        self.assertEqual(self.search(''), everything)
+        self.assertEqual(self.search('%'), everything)
+        self.assertEqual(self.search('--'), everything)
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search('iph'), ['iPhone 13'])
+        self.assertEqual(self.search('заряд'), ['Cable USB'])
+        self.assertEqual(self.search('cab usb'), ['Cable USB'])
+        self.assertEqual(self.search('iphone кабель'), [])
+
+    def test_single_letter_is_not_a_prefix(self):
+        self.assertEqual(self.search('C++'), ['Учебник C'])
+        self.assertNotIn('"C"*', self.db._fts_query('C++'))
+
+    def test_search_combines_with_other_filters(self):
+        products = self.db.get_products({'search': 'usb', 'max_price': 10})
+        self.assertEqual([row['name'] for row in products], ['Cable USB'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Отчетные запросы через драйверы sqlite3 и apsw должны давать одинаковый результат"""
+import threading
+import unittest
+
+import bd
+from tests import DatabaseTestCase
+
+
+def _fill(manager: bd.DatabaseManager):
+    """Категории, продукты и заказы для отчетов"""
+    phones = manager.create_category('Телефоны')
+    books = manager.create_category('Книги')
+    phone = manager.create_product_fast('Телефон', 500.0, phones, stock_quantity=10)
+    book = manager.create_product_fast('Книга', 20.0, books, stock_quantity=10)
+    with manager.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO customers (email, first_name, last_name)
+            VALUES ('test@example.com', 'Тест', 'Тестов')
+        """)
+        for status, items in (('delivered', [(phone, 2), (book, 3)]),
+                              ('cancelled', [(phone, 5)]),
+                              ('pending', [(book, 1)])):
+            order_id = conn.execute(
+                "INSERT INTO orders (customer_id, total_amount, status) VALUES (1, 0, ?)",
+                (status,)
+            ).lastrowid
+            for product_id, quantity in items:
+                price = conn.execute("SELECT price FROM products WHERE product_id = ?",
+                                     (product_id,)).fetchone()[0]
+                conn.execute("""
+                    INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+                    VALUES (?, ?, ?, ?)
+                """, (order_id, product_id, quantity, price))
+
+
+class ReportDriversTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        manager = bd.DatabaseManager(self.db_path, driver='sqlite3')
+        _fill(manager)
+        manager.close()
+
+    def _reports(self, driver: str):
+        manager = bd.DatabaseManager(self.db_path, driver=driver)
+        try:
+            return {
+                'sales': manager.get_sales_report(as_dicts=True),
+                'sales_empty': manager.get_sales_report(start_date='2999-01-01', as_dicts=True),
+                'popular': manager.get_popular_products(5, as_dicts=True),
+                'popular_rows': [tuple(row) for row in manager.get_popular_products(5)],
+                'popular_names': [row['name'] for row in manager.get_popular_products(5)],
+            }
+        finally:
+            manager.close()
+
+    def test_sqlite3_reports(self):
+        reports = self._reports('sqlite3')
+        self.assertEqual(reports['popular_names'], ['Книга', 'Телефон'])
+        self.assertEqual(reports['sales_empty'], [])
+        self.assertEqual({row['category_name']: row['total_quantity'] for row in reports['sales']},
+                         {'Телефоны': 2, 'Книги': 4})
+
+    @unittest.skipIf(bd.apsw is None, "apsw не установлен")
+    def test_apsw_matches_sqlite3(self):
+        self.assertEqual(self._reports('apsw'), self._reports('sqlite3'))
+
+    @unittest.skipIf(bd.apsw is None, "apsw не установлен")
+    def test_apsw_connection_settings(self):
+        manager = bd.DatabaseManager(self.db_path, driver='apsw')
+        try:
+            with manager._apsw_connection() as conn:
+                self.assertEqual(list(conn.execute("PRAGMA cache_size")), [(-65536,)])
+                self.assertEqual(list(conn.execute("PRAGMA temp_store")), [(2,)])
+        finally:
+            manager.close()
+
+    @unittest.skipIf(bd.apsw is None, "apsw не установлен")
+    def test_apsw_connections_bounded_by_pool_size(self):
+        manager = bd.DatabaseManager(self.db_path, pool_size=3, driver='apsw')
+        try:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(len(manager.get_popular_products())))
+                       for _ in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, [2] * 50)
+            self.assertLessEqual(manager._created_apsw_connections, 3)
+        finally:
+            manager.close()
+        self.assertEqual(manager._created_apsw_connections, 0)
+
+    @unittest.skipIf(bd.apsw is not None, "apsw установлен")
+    def test_apsw_required_when_requested(self):
+        with self.assertRaises(ValueError):
+            bd.DatabaseManager(self.db_path, driver='apsw')
+
+
+if __name__ == '__main__':
+    unittest.main()
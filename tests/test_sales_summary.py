@@ -0,0 +1,155 @@
+"""
+Сводка product_sales_summary, поддерживаемая триггерами, должна совпадать
+с полным пересчетом по order_items и orders после любых изменений.
+"""
+import random
+import unittest
+
+import bd
+from tests import DatabaseTestCase
+
+
+# Полный пересчет сводки - тем же запросом, что и первоначальное заполнение
+FULL_AGGREGATION_SQL = """
+    SELECT
+        p.product_id,
+        COALESCE(SUM(CASE WHEN o.status != 'cancelled' THEN oi.quantity END), 0),
+        COALESCE(SUM(CASE WHEN o.status != 'cancelled' THEN oi.quantity * oi.unit_price END), 0)
+    FROM products p
+    LEFT JOIN order_items oi ON p.product_id = oi.product_id
+    LEFT JOIN orders o ON oi.order_id = o.order_id
+    GROUP BY p.product_id
+"""
+
+STATUSES = ('pending', 'confirmed', 'shipped', 'delivered', 'cancelled')
+
+
+class SalesSummaryTest(DatabaseTestCase):
+
+    STEPS = 1500
+
+    def setUp(self):
+        super().setUp()
+        self.db = bd.DatabaseManager(self.db_path, driver='sqlite3')
+        self.category_id = self.db.create_category('Тест')
+
+    def tearDown(self):
+        self.db.close()
+
+    def assertSummaryConsistent(self, conn, msg=None):
+        """Сводка совпадает с полным пересчетом (суммы - с точностью до копеек)"""
+        summary = {row[0]: (row[1], round(row[2], 2)) for row in
+                   conn.execute("SELECT product_id, total_sold, total_revenue FROM product_sales_summary")}
+        expected = {row[0]: (row[1], round(row[2], 2)) for row in conn.execute(FULL_AGGREGATION_SQL)}
+        self.assertEqual(summary, expected, msg)
+
+    def _random_step(self, conn, rng: random.Random) -> str:
+        """Одно случайное изменение продуктов, клиентов, заказов или позиций"""
+        def ids(query):
+            return [row[0] for row in conn.execute(query)]
+
+        products = ids("SELECT product_id FROM products")
+        customers = ids("SELECT customer_id FROM customers")
+        orders = ids("SELECT order_id FROM orders")
+        items = ids("SELECT order_item_id FROM order_items")
+        price = rng.randint(1, 400) * 0.25
+
+        operation = rng.choice([
+            'add_product', 'delete_product', 'add_customer', 'delete_customer',
+            'add_order', 'delete_order', 'set_status',
+            'add_item', 'add_item', 'add_item', 'update_item', 'move_item', 'delete_item',
+        ])
+        if operation == 'add_product' or not products:
+            conn.execute("INSERT INTO products (name, price, category_id) VALUES (?, ?, ?)",
+                         (f'p{rng.random()}', price, self.category_id))
+            return 'add_product'
+        if operation == 'add_customer' or not customers:
+            conn.execute("INSERT INTO customers (email, first_name, last_name) VALUES (?, 'a', 'b')",
+                         (f'{rng.random()}@example.com',))
+            return 'add_customer'
+        if operation == 'add_order' or not orders:
+            conn.execute("INSERT INTO orders (customer_id, status) VALUES (?, ?)",
+                         (rng.choice(customers), rng.choice(STATUSES)))
+            return 'add_order'
+        if operation == 'delete_product':
+            # Продукты с позициями заказов удалить нельзя (ON DELETE RESTRICT)
+            unused = ids("SELECT product_id FROM products WHERE product_id NOT IN "
+                         "(SELECT product_id FROM order_items)")
+            if unused:
+                conn.execute("DELETE FROM products WHERE product_id = ?", (rng.choice(unused),))
+        elif operation == 'delete_customer':
+            # Каскадом удаляются заказы клиента и их позиции
+            conn.execute("DELETE FROM customers WHERE customer_id = ?", (rng.choice(customers),))
+        elif operation == 'delete_order':
+            conn.execute("DELETE FROM orders WHERE order_id = ?", (rng.choice(orders),))
+        elif operation == 'set_status':
+            conn.execute("UPDATE orders SET status = ? WHERE order_id = ?",
+                         (rng.choice(STATUSES), rng.choice(orders)))
+        elif operation == 'add_item' or not items:
+            conn.execute("""
+                INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+                VALUES (?, ?, ?, ?)
+            """, (rng.choice(orders), rng.choice(products), rng.randint(1, 5), price))
+            return 'add_item'
+        elif operation == 'update_item':
+            conn.execute("UPDATE order_items SET quantity = ?, unit_price = ? WHERE order_item_id = ?",
+                         (rng.randint(1, 5), price, rng.choice(items)))
+        elif operation == 'move_item':
+            conn.execute("UPDATE order_items SET order_id = ?, product_id = ? WHERE order_item_id = ?",
+                         (rng.choice(orders), rng.choice(products), rng.choice(items)))
+        elif operation == 'delete_item':
+            conn.execute("DELETE FROM order_items WHERE order_item_id = ?", (rng.choice(items),))
+        return operation
+
+    def test_random_changes_keep_summary_consistent(self):
+        rng = random.Random(20261015)
+        with self.db.get_connection() as conn:
+            for step in range(self.STEPS):
+                operation = self._random_step(conn, rng)
+                self.assertSummaryConsistent(conn, f"шаг {step}: {operation}")
+
+    def test_backfill_matches_full_aggregation(self):
+        rng = random.Random(42)
+        with self.db.get_connection() as conn:
+            for _ in range(300):
+                self._random_step(conn, rng)
+            # Таблица сводки без триггеров, как в БД, созданной до ее появления
+            conn.executescript("""
+                DROP TRIGGER products_summary_ai;
+                DROP TRIGGER products_summary_ad;
+                DROP TRIGGER order_items_summary_ai;
+                DROP TRIGGER order_items_summary_ad;
+                DROP TRIGGER order_items_summary_au;
+                DROP TRIGGER orders_summary_bd;
+                DROP TRIGGER orders_summary_au;
+                DROP TABLE product_sales_summary;
+            """)
+        self.db.close()
+
+        self.db = bd.DatabaseManager(self.db_path, driver='sqlite3')
+        with self.db.get_connection() as conn:
+            self.assertSummaryConsistent(conn)
+
+    def test_popular_products_follow_cancellation(self):
+        with self.db.get_connection() as conn:
+            conn.execute("INSERT INTO customers (email, first_name, last_name) VALUES ('c@example.com', 'a', 'b')")
+            first = conn.execute("INSERT INTO products (name, price, category_id) VALUES ('Первый', 10, ?)",
+                                 (self.category_id,)).lastrowid
+            second = conn.execute("INSERT INTO products (name, price, category_id) VALUES ('Второй', 10, ?)",
+                                  (self.category_id,)).lastrowid
+            big_order = conn.execute("INSERT INTO orders (customer_id) VALUES (1)").lastrowid
+            small_order = conn.execute("INSERT INTO orders (customer_id) VALUES (1)").lastrowid
+            conn.execute("INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, 5, 10)",
+                         (big_order, first))
+            conn.execute("INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, 2, 10)",
+                         (small_order, second))
+
+        self.assertEqual([row['name'] for row in self.db.get_popular_products(2)], ['Первый', 'Второй'])
+
+        with self.db.get_connection() as conn:
+            conn.execute("UPDATE orders SET status = 'cancelled' WHERE order_id = ?", (big_order,))
+        self.assertEqual([row['name'] for row in self.db.get_popular_products(2)], ['Второй', 'Первый'])
+
+
+if __name__ == '__main__':
+    unittest.main()